@@ -5,7 +5,7 @@ API endpoints to list, process, and return data for optimal garden layouts.
 from flask import Flask
 from flask_restful import reqparse, abort, Api, Resource
 
-from plantingcompanion import helpers, garden
+from plantingcompanion import exceptions, helpers, garden
 
 PLANT_VALUES = helpers.get_plant_data()
 
@@ -13,6 +13,7 @@ app = Flask(__name__)
 api = Api(app)
 
 parser = reqparse.RequestParser()
+replan_parser = reqparse.RequestParser()
 
 
 def set_garden_arguments():
@@ -24,9 +25,28 @@ def set_garden_arguments():
     for plant in PLANT_VALUES.keys():
         parser.add_argument(plant, type=int, default=0)
 
+
 set_garden_arguments()
 
 
+def set_replan_arguments():
+    """
+    Sets POST args for /garden/replan API endpoint.
+    """
+    replan_parser.add_argument(
+        'plot', type=list, location='json', required=True
+    )
+    replan_parser.add_argument('length', type=int, location='json')
+    replan_parser.add_argument('width', type=int, location='json')
+    for plant in PLANT_VALUES.keys():
+        replan_parser.add_argument(
+            plant, type=int, location='json', default=0
+        )
+
+
+set_replan_arguments()
+
+
 class Plants(Resource):
 
     def get(self):
@@ -78,8 +98,52 @@ class CreateGarden(Resource):
         }
 
 
+class ReplanGarden(Resource):
+
+    def post(self):
+        """
+        Takes the following JSON arguments:
+            'plot' (list) - required, previous garden layout
+            'length' (int) - new length, defaults to the plot length
+            'width' (int) - new width, defaults to the plot width
+            plant_name (int) - number of plants to add, or remove if
+                negative, from PLANT_VALUES
+
+        Return a dictionary with the previous layout repaired to fit the
+        changes, as well as the score of the new garden layout.
+        """
+        plants = replan_parser.parse_args()
+        plot = plants.pop('plot')
+        length = plants.pop('length')
+        width = plants.pop('width')
+        if not isinstance(plot, list) or not all(
+            isinstance(row, list) for row in plot
+        ):
+            abort(406, message="Plot must be a list of rows.")
+        if length is None:
+            length = len(plot)
+        if width is None:
+            width = len(plot[0]) if plot else 0
+
+        changes = [(plant, count) for plant, count in plants.items() if count]
+        try:
+            garden_plot = garden.Garden(length, width)
+            plot = garden_plot.replan_layout(plot, changes)
+        except (
+            exceptions.InvalidPlot,
+            exceptions.PlantDoesNotExist,
+            exceptions.NotEnoughPlants
+        ) as e:
+            abort(406, message=str(e))
+        return {
+            'score': garden.score_plot(plot),
+            'plot': plot
+        }
+
+
 api.add_resource(Plants, '/plants')
 api.add_resource(CreateGarden, '/garden')
+api.add_resource(ReplanGarden, '/garden/replan')
 
 
 if __name__ == '__main__':
@@ -11,6 +11,10 @@ class PlantDoesNotExist(Exception):
     pass
 
 
+class NotEnoughPlants(Exception):
+    pass
+
+
 class InvalidCoordinates(Exception):
     pass
 
@@ -1,16 +1,77 @@
 """Explaination of the garden object."""
 from copy import deepcopy
-from numpy import matrix, hstack, vstack
+from itertools import islice
+from numpy import hstack, vstack
 
 from plantingcompanion import exceptions, helpers
 
 PLANT_VALUES = helpers.get_plant_data()
 
+# Number of copies of a plant compared when choosing which one to remove.
+REMOVAL_CANDIDATES = 8
 
-def score_plot(layout):
-    plot = Plots()
-    plot.set_plots(layout)
-    return plot.get_total_score()
+
+def _get_neighbors(layout, x, y):
+    top_row = max(x-1, 0)
+    start_column = max(y-1, 0)
+
+    for row in range(top_row, x+1):
+        for column in range(start_column, y+1):
+            if row != x and column != y:
+                yield layout[row][column]
+
+
+def get_cell_score(layout, x, y, plant_values=PLANT_VALUES):
+    """
+    Return the score of the plant at (x, y) against its neighbors.
+    Does not validate coordinates, see Plots.get_plot_score for that.
+    """
+    current_plant = layout[x][y]
+    score = 0
+    for plant in _get_neighbors(layout, x, y):
+        score += plant_values.get(plant, {}).get(current_plant, 0)
+    return score
+
+
+def score_plot(layout, plant_values=PLANT_VALUES):
+    """
+    Return the total score of a layout.
+    Pure function: the layout (nested lists or tuples) is only read, and
+    no state is shared between calls, so it is safe to call concurrently.
+    """
+    score = 0
+    for x, row in enumerate(layout):
+        for y in range(len(row)):
+            score += get_cell_score(layout, x, y, plant_values)
+    return score
+
+
+def _get_affected_cells(layout, x, y):
+    """Yield the cells whose score depends on the plant at (x, y)."""
+    for row in range(max(x-1, 0), min(x+2, len(layout))):
+        for column in range(max(y-1, 0), min(y+2, len(layout[row]))):
+            yield row, column
+
+
+def get_local_score(layout, cells, plant_values=PLANT_VALUES):
+    """
+    Return the score of the part of a layout affected by the given cells.
+    Comparing it before and after changing those cells gives the change
+    in total score without scoring the whole layout.
+    """
+    affected = set()
+    for x, y in cells:
+        affected.update(_get_affected_cells(layout, x, y))
+    return sum(
+        get_cell_score(layout, x, y, plant_values) for x, y in affected
+    )
+
+
+def reshape(plants, length, width):
+    """Reshape a flat sequence of plants into a tuple of row tuples."""
+    return tuple(
+        tuple(plants[row*width:(row+1)*width]) for row in range(length)
+    )
 
 
 class Plots(object):
@@ -74,15 +135,6 @@ class Plots(object):
         if y >= self.columns:
             raise exceptions.InvalidCoordinates("Y-axis exceeds plot length.")
 
-    def _get_neighbors(self, x, y):
-        top_row = max(x-1, 0)
-        start_column = max(y-1, 0)
-
-        for row in range(top_row, x+1):
-            for column in range(start_column, y+1):
-                if row != x and column != y:
-                    yield self.plot[row][column]
-
     def get_plant(self, x, y):
         """
         Return plant type for (x, y) coordinate pair.
@@ -92,22 +144,21 @@ class Plots(object):
 
     def get_plot_score(self, x, y):
         self.check_coordinates(x, y)
-        score = 0
-        neighbors = list(self._get_neighbors(x, y))
-        current_plant = self.get_plant(x, y)
-        for plant in neighbors:
-            score += self.PlantValues.get(plant, {}).get(current_plant, 0)
-        return score
+        return get_cell_score(self.plot, x, y, self.PlantValues)
 
     def get_total_score(self):
-        score = 0
-        for x in range(self.rows):
-            for y in range(self.columns):
-                score += self.get_plot_score(x, y)
-        return score
+        if not self.plot:
+            return 0
+        return score_plot(self.plot, self.PlantValues)
 
 
 class Garden(object):
+    """
+    Holds the plants selected for a garden and searches for a layout.
+    Layout searches keep all of their working state local to the call,
+    so a single Garden can run several solves at once from different
+    threads, as long as plants are not added while solving.
+    """
     PlantValues = PLANT_VALUES
 
     def __init__(self, length=1, width=1):
@@ -126,10 +177,6 @@ class Garden(object):
         self.plot_size = length * width
         self.plants = {}
         self.plants_num = 0
-        self.plot = Plots()
-
-    def score_plot(self):
-        return self.plot.get_total_score()
 
     def mark_plants_as_used(self, plants, used_plants):
         for row in used_plants:
@@ -140,12 +187,10 @@ class Garden(object):
         stack = hstack if horizontal else vstack
 
         combo_one = stack((side, main)).tolist()
-        self.plot.set_plots(combo_one)
-        combo_one_score = self.plot.get_total_score()
-
         combo_two = stack((main, side)).tolist()
-        self.plot.set_plots(combo_two)
-        combo_two_score = self.plot.get_total_score()
+
+        combo_one_score = score_plot(combo_one, self.PlantValues)
+        combo_two_score = score_plot(combo_two, self.PlantValues)
 
         if combo_one_score > combo_two_score:
             return combo_one
@@ -195,19 +240,188 @@ class Garden(object):
             width = self.width
 
         plants = []
-        plots = Plots()
         for k, v in avaliable_plants.items():
             plants.extend([k]*v)
         plot_scores = []
         for p in helpers.permutations(plants, length*width):
-            plots.set_plots(
-                matrix(p).reshape(length, width).tolist()
-                )
-            score = plots.get_total_score()
-            plot_scores.append((score, p))
+            layout = reshape(p, length, width)
+            score = score_plot(layout, self.PlantValues)
+            plot_scores.append((score, layout))
 
         best_plot = max(plot_scores)[1]
-        return matrix(best_plot).reshape(length, width).tolist()
+        return [list(row) for row in best_plot]
+
+    def replan_layout(self, layout, changes=None, passes=3):
+        """
+        Repair a previous layout instead of estimating one from scratch.
+        The garden length and width are the new dimensions, and changes
+        is a list of plant/amount pairs to add (positive amount) or remove
+        (negative amount), ex. [('tomato', 1), ('basil', -1)].
+        Plants outside of the new dimensions are replanted elsewhere.
+        Only the cells touched by the changes are replanted, followed by
+        up to `passes` rounds of swaps between touched cells and their
+        neighbors.
+        """
+        if self.width > self.length:
+            raise exceptions.InvalidPlot(
+                "Width of plot cannot be larger than length."
+            )
+        old_plot = Plots(self.clean_layout(layout))
+
+        # Copy the plants that still fit, everything else is replanted.
+        plot = [[None] * self.width for row in range(self.length)]
+        positions = {}
+        pool = {}
+        for x, row in enumerate(old_plot.plot):
+            for y, plant in enumerate(row):
+                if x < self.length and y < self.width:
+                    plot[x][y] = plant
+                    positions.setdefault(plant, {})[(x, y)] = True
+                else:
+                    pool[plant] = pool.get(plant, 0) + 1
+
+        # Cells added by the new dimensions.
+        kept_rows = min(old_plot.rows, self.length)
+        kept_columns = min(old_plot.columns, self.width)
+        holes = [
+            (x, y) for x in range(kept_rows)
+            for y in range(kept_columns, self.width)
+        ]
+        holes.extend(
+            (x, y) for x in range(kept_rows, self.length)
+            for y in range(self.width)
+        )
+
+        # Only the net change of each plant matters.
+        deltas = {}
+        for plant, amount in changes or []:
+            plant = self.clean_plant(plant)
+            deltas[plant] = deltas.get(plant, 0) + amount
+
+        for plant, amount in sorted(deltas.items()):
+            if amount >= 0:
+                pool[plant] = pool.get(plant, 0) + amount
+                continue
+            pooled = pool.get(plant, 0)
+            if pooled + len(positions.get(plant, ())) < -amount:
+                raise exceptions.NotEnoughPlants(
+                    "Cannot remove %s '%s', not enough in plot." % (
+                        -amount, plant
+                    )
+                )
+            # Plants waiting to be replanted are removed first.
+            pool[plant] = max(pooled + amount, 0)
+            for i in range(-amount - pooled):
+                cell = self._find_removal(
+                    plot, plant, positions[plant], holes
+                )
+                del positions[plant][cell]
+                plot[cell[0]][cell[1]] = None
+                holes.append(cell)
+
+        if sum(pool.values()) != len(holes):
+            raise exceptions.InvalidPlot(
+                "Plot size must match amount of plants selected."
+            )
+
+        pool = dict((plant, count) for plant, count in pool.items() if count)
+        for x, y in holes:
+            plant = self._find_placement(plot, x, y, pool.keys())
+            plot[x][y] = plant
+            pool[plant] -= 1
+            if not pool[plant]:
+                del pool[plant]
+
+        self.improve_region(plot, holes, passes=passes)
+        return plot
+
+    def clean_layout(self, layout):
+        """
+        Return a copy of layout with every plant name normalized.
+        Will raise error if the layout is not a list of lists, or if any
+        plant doesn't exist.
+        """
+        if layout is None:
+            return []
+        if not isinstance(layout, list) or not all(
+            isinstance(row, list) for row in layout
+        ):
+            raise exceptions.InvalidPlot("Plot must be a list of rows.")
+        cleaned = []
+        for row in layout:
+            cleaned_row = []
+            for plant in row:
+                if not hasattr(plant, 'lower'):
+                    raise exceptions.PlantDoesNotExist(
+                        "No information about plant '%s' exists." % plant
+                        )
+                cleaned_row.append(self.clean_plant(plant))
+            cleaned.append(cleaned_row)
+        return cleaned
+
+    def _find_removal(self, plot, plant, cells, holes):
+        """
+        Return the cell that loses the least score when emptied.
+        Only copies next to holes, or up to REMOVAL_CANDIDATES copies if
+        there are fewer, are compared, so the search does not grow with
+        the size of the garden.
+        """
+        candidates = set()
+        for x, y in holes:
+            for row, column in _get_affected_cells(plot, x, y):
+                if plot[row][column] == plant:
+                    candidates.add((row, column))
+        if len(candidates) < REMOVAL_CANDIDATES:
+            candidates.update(islice(cells, REMOVAL_CANDIDATES))
+
+        removals = []
+        for x, y in candidates:
+            before = get_local_score(plot, [(x, y)], self.PlantValues)
+            plot[x][y] = None
+            after = get_local_score(plot, [(x, y)], self.PlantValues)
+            removals.append((after - before, x, y))
+            plot[x][y] = plant
+        score, x, y = max(removals)
+        return (x, y)
+
+    def _find_placement(self, plot, x, y, plants):
+        """Return the plant that scores the highest when placed at (x, y)."""
+        placements = []
+        for plant in plants:
+            plot[x][y] = plant
+            score = get_local_score(plot, [(x, y)], self.PlantValues)
+            placements.append((score, plant))
+        plot[x][y] = None
+        return max(placements)[1]
+
+    def improve_region(self, plot, cells, passes=3):
+        """
+        Swap each of cells with its neighbors while it improves the score.
+        Modifies plot in place. Each pass tries at most 8 swaps per cell,
+        so the cost grows linearly with the number of cells.
+        """
+        for i in range(passes):
+            improved = False
+            for first in cells:
+                for second in _get_affected_cells(plot, *first):
+                    (x1, y1), (x2, y2) = first, second
+                    if plot[x1][y1] == plot[x2][y2]:
+                        continue
+                    before = get_local_score(
+                        plot, [first, second], self.PlantValues
+                    )
+                    plot[x1][y1], plot[x2][y2] = plot[x2][y2], plot[x1][y1]
+                    after = get_local_score(
+                        plot, [first, second], self.PlantValues
+                    )
+                    if after > before:
+                        improved = True
+                    else:
+                        plot[x1][y1], plot[x2][y2] = (
+                            plot[x2][y2], plot[x1][y1]
+                        )
+            if not improved:
+                break
 
     def clean_plant(self, plant_string):
         """Normalizes plant name and checks if plant values exist."""
@@ -1,6 +1,7 @@
 import time
 import unittest
 import json
+from concurrent.futures import ThreadPoolExecutor
 
 from plantingcompanion import exceptions, helpers, garden, api
 
@@ -34,6 +35,33 @@ class TestAPI(unittest.TestCase):
         self.assertIsInstance(obj['score'], int)
         self.assertIsInstance(obj['plot'], list)
 
+    def test_replan_garden(self):
+        rv = self.app.post(
+            '/garden/replan',
+            data=json.dumps(dict(
+                plot=[['beans', 'beans'], ['beans', 'beans']],
+                length=3,
+                corn=2
+            )),
+            content_type='application/json'
+        )
+        obj = json.loads(rv.get_data().decode())
+
+        self.assertIsInstance(obj['score'], int)
+        self.assertEqual(len(obj['plot']), 3)
+        self.assertEqual(sum(row.count('corn') for row in obj['plot']), 2)
+
+    def test_replan_garden_invalid_plot(self):
+        for plot in (
+            [['foo', 'beans'], ['beans', 'beans']], ['ab', 'cd'], None
+        ):
+            rv = self.app.post(
+                '/garden/replan',
+                data=json.dumps(dict(plot=plot)),
+                content_type='application/json'
+            )
+            self.assertEqual(rv.status_code, 406)
+
 
 class TestHelpers(unittest.TestCase):
 
@@ -135,6 +163,14 @@ class TestPlots(unittest.TestCase):
     def test_get_total_score(self):
         self.assertEqual(self.plot.get_total_score(), 20)
 
+    def test_score_plot(self):
+        """score_plot should match Plots and accept immutable layouts."""
+        layout = tuple(tuple(row) for row in self.plot.plot)
+        self.assertEqual(garden.score_plot(layout), 20)
+        self.assertEqual(
+            garden.score_plot(layout), self.plot.get_total_score()
+        )
+
     def test_plot_size(self):
         self.assertRaises(
             exceptions.InvalidPlot, garden.Garden, 3, 5
@@ -144,6 +180,217 @@ class TestPlots(unittest.TestCase):
         )
 
 
+class TestReentrantLayouts(unittest.TestCase):
+
+    def setUp(self):
+        self.garden = garden.Garden(4, 2)
+        self.garden.add([('corn', 4), ('garlic', 2), ('beans', 2)])
+        self.other_plants = {'yarrow': 2, 'apple': 2, 'grass': 2}
+
+    def test_no_shared_state(self):
+        """Solving should not store anything on the Garden."""
+        attributes = dict(vars(self.garden))
+        self.garden.estimate_layout()
+        self.garden.find_layout()
+        self.assertEqual(vars(self.garden), attributes)
+        self.assertEqual(
+            set(attributes),
+            {'length', 'width', 'plot_size', 'plants', 'plants_num'}
+        )
+
+    def test_interleaved_solves(self):
+        """
+        Run a second solve on the same Garden in the middle of scoring the
+        first one, and check that neither result changes.
+        """
+        expected = self.garden.estimate_layout()
+        expected_other = self.garden.estimate_layout(
+            dict(self.other_plants), rows=3, columns=2
+        )
+
+        score_plot = garden.score_plot
+        results = []
+
+        def interleaved_score_plot(*args, **kwargs):
+            # Only interleave once, the nested solve uses score_plot too.
+            if garden.score_plot is interleaved_score_plot:
+                garden.score_plot = score_plot
+                results.append(self.garden.estimate_layout(
+                    dict(self.other_plants), rows=3, columns=2
+                ))
+            return score_plot(*args, **kwargs)
+
+        garden.score_plot = interleaved_score_plot
+        try:
+            layout = self.garden.estimate_layout()
+        finally:
+            garden.score_plot = score_plot
+
+        self.assertEqual(layout, expected)
+        self.assertEqual(results, [expected_other])
+
+    def test_thread_pool_solves(self):
+        """Solves on a thread pool should match the same solves in serial."""
+        solves = [
+            ({'corn': 4, 'garlic': 2, 'beans': 2}, 4, 2),
+            ({'yarrow': 2, 'apple': 2, 'grass': 2}, 3, 2),
+            ({'yarrow': 5, 'apple': 2, 'grass': 2}, 3, 3),
+            ({'corn': 2, 'garlic': 1, 'beans': 4}, 7, 1),
+            ({'carrots': 3, 'tomato': 3, 'basil': 2}, 4, 2),
+        ] * 4
+
+        def solve(args):
+            plants, rows, columns = args
+            return self.garden.estimate_layout(
+                dict(plants), rows=rows, columns=columns
+            )
+
+        expected = [solve(args) for args in solves]
+        with ThreadPoolExecutor(max_workers=8) as executor:
+            results = list(executor.map(solve, solves))
+
+        self.assertEqual(results, expected)
+
+    def test_plant_values(self):
+        """Scoring should use the PlantValues of the Plots or Garden."""
+        class NeutralPlots(garden.Plots):
+            PlantValues = {}
+
+        plot = NeutralPlots([['corn', 'corn'], ['corn', 'corn']])
+        self.assertEqual(plot.get_plot_score(1, 1), 0)
+        self.assertEqual(plot.get_total_score(), 0)
+
+
+class TestReplanLayouts(unittest.TestCase):
+
+    def setUp(self):
+        self.layout = [
+            ['corn', 'beans'],
+            ['corn', 'beans'],
+            ['garlic', 'corn'],
+            ['garlic', 'corn'],
+        ]
+
+    def count_plants(self, layout):
+        counts = {}
+        for row in layout:
+            for plant in row:
+                counts[plant] = counts.get(plant, 0) + 1
+        return counts
+
+    def test_swap_plants(self):
+        """Removing and adding one plant should only change one cell."""
+        garden_plot = garden.Garden(4, 2)
+        layout = garden_plot.replan_layout(
+            self.layout, [('corn', 1), ('garlic', -1)]
+        )
+        self.assertEqual(
+            self.count_plants(layout), {'corn': 5, 'beans': 2, 'garlic': 1}
+        )
+        changed = [
+            (x, y) for x in range(4) for y in range(2)
+            if layout[x][y] != self.layout[x][y]
+        ]
+        self.assertEqual(len(changed), 1)
+
+    def test_add_row(self):
+        garden_plot = garden.Garden(5, 2)
+        layout = garden_plot.replan_layout(self.layout, [('beans', 2)])
+        self.assertEqual(
+            self.count_plants(layout), {'corn': 4, 'beans': 4, 'garlic': 2}
+        )
+        self.assertEqual(self.layout[0], layout[0])
+
+    def test_remove_row(self):
+        """Plants cropped by smaller dimensions are replanted."""
+        garden_plot = garden.Garden(3, 2)
+        layout = garden_plot.replan_layout(self.layout, [('corn', -2)])
+        self.assertEqual(
+            self.count_plants(layout), {'corn': 2, 'beans': 2, 'garlic': 2}
+        )
+
+    def test_net_changes(self):
+        """Changes to the same plant should be added up before applying."""
+        garden_plot = garden.Garden(4, 2)
+        layout = garden_plot.replan_layout(
+            self.layout, [('basil', -1), ('basil', 1)]
+        )
+        self.assertEqual(layout, self.layout)
+        changes = [('beans', -1), ('garlic', -1), ('beans', 1), ('corn', 1)]
+        layout = garden_plot.replan_layout(self.layout, changes)
+        self.assertEqual(
+            self.count_plants(layout), {'corn': 5, 'beans': 2, 'garlic': 1}
+        )
+
+    def test_normalize_plants(self):
+        garden_plot = garden.Garden(4, 2)
+        layout = [
+            [plant.capitalize() for plant in row] for row in self.layout
+        ]
+        layout = garden_plot.replan_layout(
+            layout, [('corn', -1), ('beans', 1)]
+        )
+        self.assertEqual(
+            self.count_plants(layout), {'corn': 3, 'beans': 3, 'garlic': 2}
+        )
+
+    def test_unknown_plant(self):
+        garden_plot = garden.Garden(2, 2)
+        self.assertRaises(
+            exceptions.PlantDoesNotExist, garden_plot.replan_layout,
+            [['foo', 'corn'], ['corn', 'corn']]
+        )
+
+    def test_malformed_plot(self):
+        garden_plot = garden.Garden(2, 2)
+        for layout in (['ab', 'cd'], [1, 2], 'abcd'):
+            self.assertRaises(
+                exceptions.InvalidPlot, garden_plot.replan_layout, layout
+            )
+
+    def test_change_cost(self):
+        """A one plant change should score as many cells in any size garden."""
+        get_local_score = garden.get_local_score
+        calls = []
+
+        def counting_get_local_score(*args, **kwargs):
+            calls.append(args)
+            return get_local_score(*args, **kwargs)
+
+        counts = []
+        garden.get_local_score = counting_get_local_score
+        try:
+            for length, width in ((12, 8), (1200, 8)):
+                layout = [
+                    [('corn', 'beans', 'garlic')[(x + y) % 3]
+                     for y in range(width)]
+                    for x in range(length)
+                ]
+                del calls[:]
+                garden.Garden(length, width).replan_layout(
+                    layout, [('corn', 1), ('beans', -1)]
+                )
+                counts.append(len(calls))
+        finally:
+            garden.get_local_score = get_local_score
+
+        self.assertEqual(counts[0], counts[1])
+
+    def test_not_enough_plants(self):
+        garden_plot = garden.Garden(4, 2)
+        self.assertRaises(
+            exceptions.NotEnoughPlants, garden_plot.replan_layout,
+            self.layout, [('tomato', -1), ('corn', 1)]
+        )
+
+    def test_plot_size_mismatch(self):
+        garden_plot = garden.Garden(4, 2)
+        self.assertRaises(
+            exceptions.InvalidPlot, garden_plot.replan_layout,
+            self.layout, [('corn', 1)]
+        )
+
+
 class TestLayouts(unittest.TestCase):
 
     def compare_layout_with_estimate(self, plants, rows, columns):